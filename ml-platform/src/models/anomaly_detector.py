@@ -5,20 +5,408 @@ Advanced anomaly detection for financial trading patterns
 
 import numpy as np
 import pandas as pd
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, List, Optional, Tuple, Any, Union
 from sklearn.ensemble import IsolationForest
-from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import classification_report, roc_auc_score
 import joblib
+from joblib import Parallel, delayed, effective_n_jobs
 import logging
 from datetime import datetime, timedelta
 import redis
 import psycopg2
 from psycopg2.extras import RealDictCursor
 import json
+import hashlib
+import math
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
+# numba's default workqueue threading layer aborts the process when two
+# threads enter parallel kernels at once, so callers take turns
+_NUMBA_PARALLEL_LOCK = threading.Lock()
+
+RAPID_TRADE_WINDOW_NS = 10 * 10**9  # 10 seconds
+
+# Columns grouped on during feature extraction and classification
+GROUP_KEY_COLUMNS = ['account_id', 'instrument']
+
+# Frames smaller than this are not worth starting a process pool for
+PARALLEL_FEATURE_MIN_ROWS = 2_000_000
+
+# Environment variable carrying a SharedIsolationForest manifest to workers
+SHARED_MODEL_ENV = "DHARMAGUARD_SHARED_MODEL"
+
+FEATURE_COLUMNS = [
+    'trade_size', 'price_change', 'volume_ratio',
+    'trading_hour', 'trading_minute',
+    'account_trade_frequency', 'instrument_volatility',
+    'price_zscore', 'volume_zscore', 'rapid_succession',
+    'market_open_proximity', 'market_close_proximity'
+]
+
+
+def _json_safe(value: Any) -> Any:
+    """
+    Convert a payload value to its canonical JSON form
+    
+    NumPy scalars and arrays become Python numbers and lists, missing
+    values (None, NaN, NaT, pd.NA) and infinities become null, datetimes
+    become ISO 8601 strings and anything else becomes its str().
+    """
+    if isinstance(value, dict):
+        return {str(key): _json_safe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [_json_safe(item) for item in value]
+    if isinstance(value, np.datetime64):
+        value = pd.Timestamp(value)
+    elif isinstance(value, np.generic):
+        value = value.item()
+    if value is None or value is pd.NaT or value is pd.NA:
+        return None
+    if isinstance(value, (bool, int, str)):
+        return value
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _dumps(payload: Any) -> bytes:
+    """
+    Serialize a Redis payload as compact UTF-8 JSON, with orjson when available
+    
+    The payload is first reduced to its canonical JSON form, so both
+    backends encode the same values and never emit NaN. The bytes match
+    except for float exponents, which orjson writes as 1e16 where json
+    writes 1e+16.
+    """
+    payload = _json_safe(payload)
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(payload)
+    return json.dumps(payload, allow_nan=False, ensure_ascii=False,
+                      separators=(',', ':')).encode('utf-8')
+
+
+def _loads(payload: Union[str, bytes]) -> Any:
+    """Deserialize a Redis payload written by _dumps"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(payload)
+    return json.loads(payload)
+
+
+def _with_categorical_keys(trade_data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Return trade_data with the group key columns stored as categoricals
+    
+    Grouping and factorizing then work on the integer codes instead of
+    hashing strings on every pass. The caller's frame is not modified.
+    """
+    casts = {
+        column: trade_data[column].astype('category')
+        for column in GROUP_KEY_COLUMNS
+        if column in trade_data.columns and not isinstance(trade_data[column].dtype, pd.CategoricalDtype)
+    }
+    return trade_data.assign(**casts) if casts else trade_data
+
+
+def _instrument_shards(instrument: pd.Series, n_shards: int) -> List[np.ndarray]:
+    """
+    Split row positions into at most n_shards sets of whole instruments
+    
+    Instruments are packed into shards of roughly equal row counts and
+    each shard keeps row order. Rows with a missing instrument never
+    group with other rows, so they go into the first shard.
+    """
+    codes = pd.factorize(instrument, sort=False)[0]
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    
+    # Cut the instrument-sorted positions only at instrument boundaries
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    if starts.size > 1 and sorted_codes[0] < 0:
+        starts = starts[1:]
+        starts[0] = 0
+    targets = np.arange(1, n_shards) * (len(codes) / n_shards)
+    cuts = np.unique(starts[np.searchsorted(starts, targets)
+                            .clip(max=starts.size - 1)])
+    cuts = cuts[cuts > 0]
+    return [np.sort(positions) for positions in np.split(order, cuts)]
+
+
+def _extract_shard_features(shard: pd.DataFrame) -> np.ndarray:
+    """Feature matrix of one instrument shard, run in a joblib worker"""
+    return AnomalyDetector()._extract_features_pandas(shard).to_numpy()
+
+
+def _timestamps_ns(ts: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    View parsed timestamps as int64 nanoseconds
+    
+    Returns (ts_ns, valid) where valid is False for NaT rows.
+    """
+    ts_ns = ts.to_numpy(dtype='datetime64[ns]').view('i8')
+    return ts_ns, ts.notna().to_numpy()
+
+
+def _group_codes(*keys: pd.Series) -> np.ndarray:
+    """Integer group code per row for one or more key columns, -1 if any key is missing"""
+    codes = np.zeros(len(keys[0]), dtype=np.int64)
+    for key in keys:
+        key_codes, uniques = pd.factorize(key, sort=False)
+        codes = np.where((codes < 0) | (key_codes < 0), -1, codes * len(uniques) + key_codes)
+    return codes
+
+
+def _grouped_prev_index(codes: np.ndarray) -> np.ndarray:
+    """
+    Position of the previous row of the same group, in row order
+    
+    Works on unsorted frames via a stable argsort. Rows that are first
+    in their group, or have a missing group code (-1), get -1.
+    """
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    
+    sorted_prev = np.full(len(codes), -1, dtype=np.int64)
+    same = (sorted_codes[1:] == sorted_codes[:-1]) & (sorted_codes[1:] >= 0)
+    sorted_prev[1:][same] = order[:-1][same]
+    
+    prev = np.empty_like(sorted_prev)
+    prev[order] = sorted_prev
+    return prev
+
+
+def _grouped_prev_diff(values: np.ndarray, codes: np.ndarray,
+                       valid: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Difference to the previous row of the same group, in row order
+    
+    Returns (diffs, has_diff). has_diff is False (and the diff 0) for rows
+    with no predecessor in their group, a missing group code, or where
+    either value is flagged invalid.
+    """
+    prev = _grouped_prev_index(codes)
+    prev_pos = np.maximum(prev, 0)
+    has_diff = (prev >= 0) & valid & valid[prev_pos]
+    diffs = np.zeros(len(codes), dtype=values.dtype)
+    np.subtract(values, values[prev_pos], out=diffs, where=has_diff)
+    return diffs, has_diff
+
+
+def _grouped_pct_change(values: np.ndarray, codes: np.ndarray) -> np.ndarray:
+    """
+    Relative change from the previous row of the same group
+    
+    Same result as groupby(...).pct_change(): NaN for the first row of a
+    group, inf when the previous value is 0.
+    """
+    prev = _grouped_prev_index(codes)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change = values / values[np.maximum(prev, 0)] - 1
+    change[prev < 0] = np.nan
+    return change
+
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, cache=True)
+    def _grouped_rolling_std(values, order, offsets, window, step, out):
+        """
+        Trailing rolling sample std per group, one group per thread
+        
+        order lists row positions grouped by key (each group in row order)
+        and offsets[g]:offsets[g + 1] delimits group g within it. Matches
+        pandas rolling(window, min_periods=1).std(): NaNs are skipped and
+        windows with fewer than two values yield NaN. With step > 1 only
+        every step-th window of a group is evaluated and the rows between
+        are forward-filled from the last evaluated value.
+        """
+        for g in prange(len(offsets) - 1):
+            start = offsets[g]
+            stop = offsets[g + 1]
+            last = np.nan
+            for j in range(start, stop):
+                if (j - start) % step != 0:
+                    out[order[j]] = last
+                    continue
+                
+                lo = max(start, j - window + 1)
+                
+                count = 0
+                total = 0.0
+                for k in range(lo, j + 1):
+                    v = values[order[k]]
+                    if not np.isnan(v):
+                        count += 1
+                        total += v
+                
+                std = np.nan
+                if count >= 2:
+                    mean = total / count
+                    ssq = 0.0
+                    for k in range(lo, j + 1):
+                        v = values[order[k]]
+                        if not np.isnan(v):
+                            ssq += (v - mean) * (v - mean)
+                    std = np.sqrt(ssq / (count - 1))
+                
+                if step > 1 and np.isnan(std):
+                    std = last
+                out[order[j]] = std
+                if not np.isnan(std):
+                    last = std
+    
+    @njit(cache=True)
+    def _feature_group_pass(inst, acct, pair, values, n_inst, n_acct, n_pair):
+        """
+        Sequential pass in row order collecting per-group state
+        
+        values[:, k] are the columns (price, quantity) summarised per
+        instrument. Returns their NaN-skipping mean and sample std per
+        instrument (NaN for empty / single-value groups), each row's
+        previous row within its instrument and its account/instrument
+        pair (-1 if none), and each row's 1-based position within its
+        account (0 if the account is missing).
+        """
+        n = len(inst)
+        n_values = values.shape[1]
+        count = np.zeros((n_inst, n_values))
+        mean = np.zeros((n_inst, n_values))
+        m2 = np.zeros((n_inst, n_values))
+        last_inst = np.full(n_inst, -1, dtype=np.int64)
+        last_pair = np.full(n_pair, -1, dtype=np.int64)
+        acct_seen = np.zeros(n_acct, dtype=np.int64)
+        prev_inst = np.full(n, -1, dtype=np.int64)
+        prev_pair = np.full(n, -1, dtype=np.int64)
+        acct_rank = np.zeros(n, dtype=np.int64)
+        
+        for i in range(n):
+            g = inst[i]
+            if g >= 0:
+                prev_inst[i] = last_inst[g]
+                last_inst[g] = i
+                for k in range(n_values):
+                    v = values[i, k]
+                    if not np.isnan(v):
+                        # Welford update
+                        count[g, k] += 1
+                        delta = v - mean[g, k]
+                        mean[g, k] += delta / count[g, k]
+                        m2[g, k] += delta * (v - mean[g, k])
+            
+            h = pair[i]
+            if h >= 0:
+                prev_pair[i] = last_pair[h]
+                last_pair[h] = i
+            
+            a = acct[i]
+            if a >= 0:
+                acct_seen[a] += 1
+                acct_rank[i] = acct_seen[a]
+        
+        std = np.full((n_inst, n_values), np.nan)
+        for g in range(n_inst):
+            for k in range(n_values):
+                if count[g, k] == 0:
+                    mean[g, k] = np.nan
+                elif count[g, k] > 1:
+                    std[g, k] = np.sqrt(m2[g, k] / (count[g, k] - 1))
+        
+        return mean, std, prev_inst, prev_pair, acct_rank
+    
+    @njit(cache=True)
+    def _nan_to_zero(v):
+        return 0.0 if np.isnan(v) else v
+    
+    @njit(parallel=True, cache=True, error_model='numpy')
+    def _fill_features(price, quantity, inst, wall_ns, ts_ns, ts_valid, mean, std,
+                       prev_inst, prev_pair, acct_rank, volatility, rapid_window_ns, out):
+        """
+        Fill the float32 feature matrix in one parallel pass over rows
+        
+        Column order follows FEATURE_COLUMNS. Missing values become 0, as
+        the pandas path's final fillna(0) does.
+        """
+        ns_per_minute = 60 * 10**9
+        ns_per_hour = 60 * ns_per_minute
+        
+        for i in prange(len(price)):
+            p = price[i]
+            q = quantity[i]
+            g = inst[i]
+            
+            price_change = np.nan
+            volume_ratio = np.nan
+            price_zscore = np.nan
+            volume_zscore = np.nan
+            if g >= 0:
+                j = prev_inst[i]
+                if j >= 0:
+                    price_change = p / price[j] - 1
+                volume_ratio = q / mean[g, 1]
+                p_std = std[g, 0] if not np.isnan(std[g, 0]) else 1.0
+                q_std = std[g, 1] if not np.isnan(std[g, 1]) else 1.0
+                price_zscore = (p - mean[g, 0]) / p_std
+                volume_zscore = (q - mean[g, 1]) / q_std
+            
+            hour = np.nan
+            minute = np.nan
+            if ts_valid[i]:
+                hour = float((wall_ns[i] // ns_per_hour) % 24)
+                minute = float((wall_ns[i] // ns_per_minute) % 60)
+            
+            # A trade with no earlier gap to compare counts as rapid
+            j = prev_pair[i]
+            rapid = 1.0
+            if j >= 0 and ts_valid[i] and ts_valid[j] and ts_ns[i] - ts_ns[j] >= rapid_window_ns:
+                rapid = 0.0
+            
+            out[i, 0] = _nan_to_zero(q * p)
+            out[i, 1] = _nan_to_zero(price_change)
+            out[i, 2] = _nan_to_zero(volume_ratio)
+            out[i, 3] = _nan_to_zero(hour)
+            out[i, 4] = _nan_to_zero(minute)
+            out[i, 5] = acct_rank[i]
+            out[i, 6] = _nan_to_zero(volatility[i])
+            out[i, 7] = _nan_to_zero(price_zscore)
+            out[i, 8] = _nan_to_zero(volume_zscore)
+            out[i, 9] = rapid
+            out[i, 10] = _nan_to_zero(abs(hour - 9))  # NSE opens at 9:15
+            out[i, 11] = _nan_to_zero(abs(hour - 15))  # NSE closes at 3:30
+
+
+def _group_offsets(codes: np.ndarray, n_groups: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Row positions ordered by group code, and the offset of each group within them
+    
+    Rows with a missing code (-1) are left out. Each group keeps row order.
+    """
+    valid = codes >= 0
+    order = np.flatnonzero(valid)[np.argsort(codes[valid], kind='stable')]
+    offsets = np.zeros(n_groups + 1, dtype=np.int64)
+    np.cumsum(np.bincount(codes[valid], minlength=n_groups), out=offsets[1:])
+    return order, offsets
+
 class AnomalyDetector:
     """
     Advanced anomaly detection for trading surveillance
@@ -28,7 +416,9 @@ class AnomalyDetector:
     def __init__(self, 
                  contamination: float = 0.1,
                  random_state: int = 42,
-                 model_type: str = "isolation_forest"):
+                 model_type: str = "isolation_forest",
+                 inference: str = "sklearn",
+                 volatility_step: int = 1):
         """
         Initialize anomaly detector
         
@@ -36,13 +426,24 @@ class AnomalyDetector:
             contamination: Expected proportion of outliers
             random_state: Random state for reproducibility
             model_type: Type of model to use
+            inference: "sklearn", "treelite" (compiled CPU library) or "fil" (cuML GPU)
+            volatility_step: Evaluate instrument volatility every n-th trade per
+                instrument and forward-fill in between; 1 is full resolution.
+                Only the numba kernel strides; the pandas fallback always
+                computes full resolution
         """
         self.contamination = contamination
         self.random_state = random_state
         self.model_type = model_type
+        self.inference = inference
+        self.volatility_step = volatility_step
         self.model = None
-        self.scaler = StandardScaler()
+        self._predictor = None  # compiled decision_function, if any
+        self._shared_forest = None  # set by attach_shared_model
+        self._mu = None  # legacy per-feature mean, see load_model
+        self._inv_sigma = None  # legacy per-feature 1 / std
         self.feature_columns = []
+        self.model_fingerprint = None  # identifies the fitted model in shared caches
         self.is_trained = False
         
         # Initialize model based on type
@@ -58,70 +459,177 @@ class AnomalyDetector:
                 warm_start=False
             )
     
-    def extract_features(self, trade_data: pd.DataFrame) -> pd.DataFrame:
+    def extract_features(self, trade_data: pd.DataFrame, n_jobs: int = 1) -> pd.DataFrame:
         """
         Extract features for anomaly detection
         
         Args:
             trade_data: Raw trade data
+            n_jobs: Worker processes for extracting instrument shards
+                when numba is unavailable; 1 extracts in-process
             
         Returns:
             Feature matrix
         """
-        features = pd.DataFrame()
+        trade_data = _with_categorical_keys(trade_data)
+        if NUMBA_AVAILABLE:
+            features = self._extract_features_numba(trade_data)
+        elif (effective_n_jobs(n_jobs) > 1 and len(trade_data) >= PARALLEL_FEATURE_MIN_ROWS
+                and trade_data['instrument'].nunique() > 1):
+            features = self._extract_features_sharded(trade_data, n_jobs)
+        else:
+            features = self._extract_features_pandas(trade_data)
         
-        # Basic trade features
-        features['trade_size'] = trade_data['quantity'] * trade_data['price']
-        features['price_change'] = trade_data.groupby('instrument')['price'].pct_change().fillna(0)
-        features['volume_ratio'] = (trade_data['quantity'] / 
-                                  trade_data.groupby('instrument')['quantity'].transform('mean'))
+        self.feature_columns = features.columns.tolist()
+        return features
+    
+    def _extract_features_sharded(self, trade_data: pd.DataFrame, n_jobs: int) -> pd.DataFrame:
+        """
+        Extract pandas features over instrument shards in joblib workers
         
-        # Time-based features
-        trade_data['hour'] = pd.to_datetime(trade_data['timestamp']).dt.hour
-        trade_data['minute'] = pd.to_datetime(trade_data['timestamp']).dt.minute
-        features['trading_hour'] = trade_data['hour']
-        features['trading_minute'] = trade_data['minute']
+        Every feature except account_trade_frequency depends only on the
+        row itself or on earlier rows of its instrument (rapid_succession
+        groups by account and instrument), so shards are independent.
+        account_trade_frequency counts trades across instruments and is
+        recomputed over the whole frame after the shards are merged.
+        """
+        # A few shards per worker keeps the load balanced without paying
+        # task overhead per instrument
+        shards = _instrument_shards(trade_data['instrument'], effective_n_jobs(n_jobs) * 4)
+        parts = Parallel(n_jobs=n_jobs, backend='loky')(
+            delayed(_extract_shard_features)(trade_data.iloc[positions])
+            for positions in shards)
         
-        # Account-based features
-        features['account_trade_frequency'] = (trade_data.groupby('account_id')
-                                             .cumcount() + 1)
+        # Scatter back by position; the index may be unsorted or non-unique
+        out = np.empty((len(trade_data), len(FEATURE_COLUMNS)), dtype=np.float32)
+        for positions, part in zip(shards, parts):
+            out[positions] = part
         
-        # Instrument-based features
-        features['instrument_volatility'] = (trade_data.groupby('instrument')['price']
-                                           .rolling(window=10, min_periods=1)
-                                           .std().fillna(0))
+        features = pd.DataFrame(out, index=trade_data.index, columns=FEATURE_COLUMNS)
+        features['account_trade_frequency'] = (trade_data.groupby('account_id', sort=False, observed=True)
+                                               .cumcount().add(1).fillna(0).astype(np.float32))
+        return features
+    
+    def _extract_features_numba(self, trade_data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Extract features with fused numba kernels
         
-        # Statistical features
-        features['price_zscore'] = ((trade_data['price'] - 
-                                   trade_data.groupby('instrument')['price'].transform('mean')) /
-                                  trade_data.groupby('instrument')['price'].transform('std').fillna(1))
+        Group keys are factorized once; one sequential pass gathers the
+        per-instrument statistics and per-row group predecessors, and one
+        parallel pass writes every feature of a row into a float32 matrix.
+        """
+        inst_codes, inst_uniques = pd.factorize(trade_data['instrument'], sort=False)
+        acct_codes, acct_uniques = pd.factorize(trade_data['account_id'], sort=False)
+        pair_keys = _group_codes(trade_data['account_id'], trade_data['instrument'])
+        pair_codes, pair_uniques = pd.factorize(pair_keys, sort=False)
+        pair_codes[pair_keys < 0] = -1
         
-        features['volume_zscore'] = ((trade_data['quantity'] - 
-                                    trade_data.groupby('instrument')['quantity'].transform('mean')) /
-                                   trade_data.groupby('instrument')['quantity'].transform('std').fillna(1))
+        price = trade_data['price'].to_numpy(dtype=np.float64)
+        quantity = trade_data['quantity'].to_numpy(dtype=np.float64)
         
-        # Sequential features
-        features['rapid_succession'] = (trade_data.groupby(['account_id', 'instrument'])['timestamp']
-                                      .diff().dt.total_seconds().fillna(0) < 10).astype(int)
+        # Hours/minutes come from wall-clock time, gaps from absolute time
+        ts = pd.to_datetime(trade_data['timestamp'])
+        ts_ns, ts_valid = _timestamps_ns(ts)
+        wall_ns = ts_ns if ts.dt.tz is None else _timestamps_ns(ts.dt.tz_localize(None))[0]
         
-        # Market timing features
-        features['market_open_proximity'] = np.abs(trade_data['hour'] - 9)  # NSE opens at 9:15
-        features['market_close_proximity'] = np.abs(trade_data['hour'] - 15)  # NSE closes at 3:30
+        mean, std, prev_inst, prev_pair, acct_rank = _feature_group_pass(
+            inst_codes, acct_codes, pair_codes, np.column_stack([price, quantity]),
+            len(inst_uniques), len(acct_uniques), len(pair_uniques))
         
-        # Fill NaN values
-        features = features.fillna(0)
+        order, offsets = _group_offsets(inst_codes, len(inst_uniques))
+        volatility = np.full(len(trade_data), np.nan)
+        out = np.empty((len(trade_data), len(FEATURE_COLUMNS)), dtype=np.float32)
+        with _NUMBA_PARALLEL_LOCK:
+            _grouped_rolling_std(price, order, offsets, 10, self.volatility_step, volatility)
+            _fill_features(price, quantity, inst_codes, wall_ns, ts_ns, ts_valid, mean, std,
+                           prev_inst, prev_pair, acct_rank, volatility, RAPID_TRADE_WINDOW_NS, out)
         
-        self.feature_columns = features.columns.tolist()
+        return pd.DataFrame(out, index=trade_data.index, columns=FEATURE_COLUMNS)
+    
+    def _extract_features_pandas(self, trade_data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Extract features with pandas groupby operations
+        
+        Works on a RangeIndex view of the frame: the grouped rolling
+        result is aligned back by label, which fails on a non-unique
+        index. The caller's index is restored on the result.
+        """
+        index = trade_data.index
+        trade_data = trade_data.reset_index(drop=True)
+        features = pd.DataFrame(index=trade_data.index)
+
+        # Group once and reuse for every per-instrument aggregation
+        g_inst = trade_data.groupby('instrument', sort=False, observed=True)
+        g_price = g_inst['price']
+        g_qty = g_inst['quantity']
+        price_mean = g_price.transform('mean')
+        price_std = g_price.transform('std').fillna(1)
+        qty_mean = g_qty.transform('mean')
+        qty_std = g_qty.transform('std').fillna(1)
+
+        # Parse timestamps once
+        ts = pd.to_datetime(trade_data['timestamp'])
+        hour = ts.dt.hour
+
+        # Basic trade features
+        features['trade_size'] = trade_data['quantity'] * trade_data['price']
+        features['price_change'] = _grouped_pct_change(trade_data['price'].to_numpy(dtype=np.float64),
+                                                       _group_codes(trade_data['instrument']))
+        features['volume_ratio'] = trade_data['quantity'] / qty_mean
+
+        # Time-based features
+        features['trading_hour'] = hour
+        features['trading_minute'] = ts.dt.minute
+
+        # Account-based features
+        features['account_trade_frequency'] = (trade_data.groupby('account_id', sort=False, observed=True)
+                                             .cumcount() + 1)
+
+        # Instrument-based features
+        features['instrument_volatility'] = self._instrument_volatility(g_price, window=10)
+
+        # Statistical features
+        features['price_zscore'] = (trade_data['price'] - price_mean) / price_std
+        features['volume_zscore'] = (trade_data['quantity'] - qty_mean) / qty_std
+
+        # Sequential features; a trade with no earlier gap to compare counts as rapid
+        ts_ns, ts_valid = _timestamps_ns(ts)
+        pair_codes = _group_codes(trade_data['account_id'], trade_data['instrument'])
+        gaps, has_gap = _grouped_prev_diff(ts_ns, pair_codes, ts_valid)
+        features['rapid_succession'] = (~has_gap | (gaps < RAPID_TRADE_WINDOW_NS)).astype(int)
+
+        # Market timing features
+        features['market_open_proximity'] = np.abs(hour - 9)  # NSE opens at 9:15
+        features['market_close_proximity'] = np.abs(hour - 15)  # NSE closes at 3:30
+        
+        # Fill NaN values; float32 halves the bytes moved by scaling and tree traversal
+        features = features.fillna(0).astype(np.float32)
+        features.index = index
         return features
     
+    def _instrument_volatility(self, g_price: Any, window: int) -> pd.Series:
+        """
+        Per-instrument trailing rolling std of price
+        
+        Always full resolution: pandas' grouped rolling has no step
+        argument, and thinning its output afterwards would only add work,
+        so volatility_step applies to the numba kernel alone.
+        """
+        volatility = (g_price.rolling(window=window, min_periods=1)
+                      .std()
+                      .reset_index(level=0, drop=True))
+        return volatility.fillna(0)
+    
     def train(self, trade_data: pd.DataFrame, 
-              labeled_anomalies: Optional[pd.Series] = None) -> Dict[str, float]:
+              labeled_anomalies: Optional[pd.Series] = None,
+              n_jobs: int = -1) -> Dict[str, float]:
         """
         Train the anomaly detection model
         
         Args:
             trade_data: Training data
             labeled_anomalies: Optional labeled anomalies for evaluation
+            n_jobs: Worker processes for feature extraction on large frames
             
         Returns:
             Training metrics
@@ -129,14 +637,21 @@ class AnomalyDetector:
         logger.info(f"Training anomaly detector with {len(trade_data)} samples")
         
         # Extract features
-        features = self.extract_features(trade_data)
+        features = self.extract_features(trade_data, n_jobs=n_jobs)
         
-        # Scale features
-        features_scaled = self.scaler.fit_transform(features)
+        # IsolationForest splits are invariant to per-feature affine
+        # scaling, so the model is fit on the raw features
+        self._mu = None
+        self._inv_sigma = None
+        features_scaled = features.to_numpy(dtype=np.float32)
         
         # Train model
         self.model.fit(features_scaled)
+        self.model_fingerprint = self._fingerprint_model()
         self.is_trained = True
+        if self.inference != "treelite":
+            # The treelite library is compiled once, by save_model
+            self._build_predictor()
         
         # Evaluate if labeled data is available
         metrics = {}
@@ -165,27 +680,150 @@ class AnomalyDetector:
         if not self.is_trained:
             raise ValueError("Model must be trained before making predictions")
         
-        # Extract features
+        return self.predict_scaled(self.transform(trade_data))
+    
+    def transform(self, trade_data: pd.DataFrame) -> np.ndarray:
+        """
+        Extract the feature matrix the model scores
+        
+        Args:
+            trade_data: Trade data to transform
+            
+        Returns:
+            float32 feature matrix
+        """
         features = self.extract_features(trade_data)
+        return self._scale_features(features)
+    
+    def _build_predictor(self, libpath: Optional[str] = None) -> None:
+        """
+        Set up compiled inference for the fitted forest
+        
+        "fil" converts the forest with Treelite and loads it into cuML's
+        Forest Inference Library. "treelite" loads the tl2cgen shared
+        library at libpath, normally the one save_model compiled; without
+        one the forest is compiled into a temporary directory that is
+        removed once the library is loaded. Treelite scores
+        IsolationForest as -score_samples, so decision_function is
+        recovered by negating and subtracting the model's offset_.
+        Falls back to scikit-learn if the libraries or the compiler
+        toolchain are unavailable.
+        
+        Args:
+            libpath: Shared library compiled by save_model, if any
+        """
+        self._predictor = None
+        if self.inference == "sklearn" or not isinstance(self.model, IsolationForest):
+            return
         
-        # Scale features
-        features_scaled = self.scaler.transform(features)
+        try:
+            if self.inference == "fil":
+                import cupy
+                import treelite
+                from cuml import ForestInference
+                tl_model = treelite.sklearn.import_model(self.model)
+                fil_model = ForestInference.load_from_treelite_model(tl_model, output_class=False)
+                
+                def outlier_score(features_scaled: np.ndarray) -> np.ndarray:
+                    return cupy.asnumpy(fil_model.predict(features_scaled))
+            else:
+                import tl2cgen
+                if libpath is not None and os.path.exists(libpath):
+                    tl_predictor = tl2cgen.Predictor(libpath)
+                else:
+                    # The loaded library stays mapped after its file is removed
+                    with tempfile.TemporaryDirectory(prefix="dharmaguard_if_") as workdir:
+                        libpath = os.path.join(workdir, "isolation_forest.so")
+                        if not self._export_treelite_lib(libpath):
+                            return
+                        tl_predictor = tl2cgen.Predictor(libpath)
+                
+                def outlier_score(features_scaled: np.ndarray) -> np.ndarray:
+                    return tl_predictor.predict(tl2cgen.DMatrix(features_scaled))
+        except ImportError as e:
+            logger.warning(f"{self.inference} inference unavailable, using scikit-learn: {e}")
+            return
         
-        # Make predictions
-        predictions = self.model.predict(features_scaled)
-        anomaly_scores = self.model.decision_function(features_scaled)
+        offset = self.model.offset_
+        
+        def decision_function(features_scaled: np.ndarray) -> np.ndarray:
+            return -np.asarray(outlier_score(features_scaled)).reshape(-1) - offset
+        
+        self._predictor = decision_function
+        logger.info(f"Using {self.inference} inference for IsolationForest")
+    
+    def _export_treelite_lib(self, libpath: str) -> bool:
+        """
+        Compile the forest to a tl2cgen shared library at libpath
+        
+        Returns False, after logging why, when treelite/tl2cgen or the
+        gcc toolchain are unavailable or compilation fails.
+        """
+        try:
+            import treelite
+            import tl2cgen
+        except ImportError as e:
+            logger.warning(f"treelite inference unavailable, using scikit-learn: {e}")
+            return False
+        
+        tl_model = treelite.sklearn.import_model(self.model)
+        try:
+            # ValueError: toolchain not found
+            tl2cgen.export_lib(tl_model, toolchain="gcc", libpath=libpath,
+                               params={'parallel_comp': 32})
+        except (tl2cgen.TL2cgenError, ValueError) as e:
+            logger.warning(f"tl2cgen compilation failed, using scikit-learn: {e}")
+            return False
+        return True
+    
+    def _scale_features(self, features: pd.DataFrame) -> np.ndarray:
+        """
+        Convert features to the model's float32 input
+        
+        Models trained on raw features pass through unchanged. Bundles
+        saved while features were standardized carry their mean/std and
+        are scaled as (x - mu) * inv_sigma, since their thresholds are
+        in scaled units.
+        """
+        if self._mu is None:
+            return features.to_numpy(dtype=np.float32)
+        scaled = features.to_numpy(dtype=np.float32) - self._mu
+        np.multiply(scaled, self._inv_sigma, out=scaled)
+        return scaled
+    
+    def predict_scaled(self, features_scaled: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Predict anomalies from an already extracted feature matrix
+        
+        Args:
+            features_scaled: Output of transform()
+            
+        Returns:
+            Tuple of (predictions, anomaly_scores)
+        """
+        if self._predictor is not None:
+            # Same rule as IsolationForest.predict: negative decision -> outlier
+            anomaly_scores = self._predictor(features_scaled)
+            predictions = np.where(anomaly_scores < 0, -1, 1)
+        else:
+            predictions = self.model.predict(features_scaled)
+            anomaly_scores = self.model.decision_function(features_scaled)
         
         # Convert predictions to binary (0 = normal, 1 = anomaly)
         predictions_binary = (predictions == -1).astype(int)
         
         return predictions_binary, anomaly_scores
     
-    def detect_patterns(self, trade_data: pd.DataFrame) -> List[Dict[str, Any]]:
+    def detect_patterns(self, trade_data: pd.DataFrame,
+                        predictions: Optional[np.ndarray] = None,
+                        scores: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
         """
         Detect specific anomaly patterns
         
         Args:
             trade_data: Trade data to analyze
+            predictions: Optional precomputed predictions for trade_data
+            scores: Optional precomputed anomaly scores for trade_data
             
         Returns:
             List of detected patterns with details
@@ -193,86 +831,148 @@ class AnomalyDetector:
         if not self.is_trained:
             raise ValueError("Model must be trained before detecting patterns")
         
-        predictions, scores = self.predict(trade_data)
+        trade_data = _with_categorical_keys(trade_data)
+        if predictions is None or scores is None:
+            predictions, scores = self.predict(trade_data)
         
-        patterns = []
-        anomaly_indices = np.where(predictions == 1)[0]
+        mask = predictions == 1
+        positions = np.flatnonzero(mask)
+        anomaly_scores = np.asarray(scores, dtype=np.float64)[mask]
+        stats = self._pattern_stats(trade_data)
+        pattern_types = self._classify_anomaly_types(trade_data, stats, positions)
         
-        for idx in anomaly_indices:
-            trade = trade_data.iloc[idx]
-            score = scores[idx]
-            
-            # Determine pattern type based on features
-            pattern_type = self._classify_anomaly_type(trade, trade_data)
-            
-            pattern = {
-                'trade_id': trade.get('trade_id', f'trade_{idx}'),
-                'timestamp': trade['timestamp'],
-                'account_id': trade['account_id'],
-                'instrument': trade['instrument'],
-                'pattern_type': pattern_type,
-                'anomaly_score': float(score),
-                'confidence': float(1 / (1 + np.exp(score))),  # Sigmoid transformation
-                'details': self._get_pattern_details(trade, trade_data, pattern_type)
-            }
-            patterns.append(pattern)
+        anomalies = trade_data.loc[mask, ['timestamp', 'account_id', 'instrument']].reset_index(drop=True)
+        if 'trade_id' in trade_data.columns:
+            trade_ids = trade_data['trade_id'].to_numpy()[mask]
+        else:
+            trade_ids = [f'trade_{idx}' for idx in positions]
+        anomalies.insert(0, 'trade_id', trade_ids)
+        anomalies['pattern_type'] = pattern_types
+        anomalies['anomaly_score'] = anomaly_scores
+        anomalies['confidence'] = 1.0 / (1.0 + np.exp(anomaly_scores))  # Sigmoid transformation
+        
+        patterns = anomalies.to_dict('records')
+        for pattern, details in zip(patterns, self._get_pattern_details(stats, positions, pattern_types)):
+            pattern['details'] = details
         
         return patterns
     
-    def _classify_anomaly_type(self, trade: pd.Series, all_trades: pd.DataFrame) -> str:
+    def _pattern_stats(self, all_trades: pd.DataFrame) -> Dict[str, Any]:
         """
-        Classify the type of anomaly detected
+        Per-trade statistics used to classify and describe anomalies
+        
+        Only the cheap row-level values are built here; the account and
+        instrument aggregates are added on demand by _classify_anomaly_types.
         """
-        # Simple pattern classification based on trade characteristics
-        trade_size = trade['quantity'] * trade['price']
+        quantity = all_trades['quantity'].to_numpy(dtype=np.float64)
+        price = all_trades['price'].to_numpy(dtype=np.float64)
+        ts = pd.to_datetime(all_trades['timestamp'])
         
-        # Check for large trade size
-        if trade_size > all_trades['quantity'].mean() * all_trades['price'].mean() * 10:
-            return "UNUSUALLY_LARGE_TRADE"
+        return {
+            'quantity': quantity,
+            'price': price,
+            'trade_size': quantity * price,
+            'avg_size': all_trades['quantity'].mean() * all_trades['price'].mean(),
+            'ts': ts,
+            'hour': ts.dt.hour.to_numpy()
+        }
+    
+    def _add_account_stats(self, all_trades: pd.DataFrame, stats: Dict[str, Any]) -> None:
+        """Add per-account trade count and shortest gap between consecutive trades"""
+        ts_ns, ts_valid = _timestamps_ns(stats['ts'])
+        account_codes = _group_codes(all_trades['account_id'])
+        gaps, has_gap = _grouped_prev_diff(ts_ns, account_codes, ts_valid)
+        no_gap = np.iinfo(np.int64).max
+        min_gap = np.full(len(account_codes), no_gap, dtype=np.int64)
+        np.minimum.at(min_gap, account_codes[has_gap], gaps[has_gap])
+        counts = np.bincount(account_codes[account_codes >= 0], minlength=len(account_codes))
+        has_account = account_codes >= 0
+        account_idx = np.maximum(account_codes, 0)
         
-        # Check for rapid succession of trades
-        same_account_trades = all_trades[all_trades['account_id'] == trade['account_id']]
-        if len(same_account_trades) > 1:
-            time_diffs = pd.to_datetime(same_account_trades['timestamp']).diff().dt.total_seconds()
-            if (time_diffs < 10).any():
-                return "RAPID_TRADING"
+        stats['account_trade_count'] = np.where(has_account, counts[account_idx], 0)
+        stats['account_min_gap_ns'] = np.where(has_account, min_gap[account_idx], no_gap)
+    
+    def _add_instrument_stats(self, all_trades: pd.DataFrame, stats: Dict[str, Any]) -> None:
+        """Add per-instrument median price and trade count"""
+        g_price = all_trades.groupby('instrument', sort=False, observed=True)['price']
+        stats['instrument_median'] = g_price.transform('median').to_numpy()
+        stats['instrument_count'] = g_price.transform('size').to_numpy()
+    
+    def _classify_anomaly_types(self, all_trades: pd.DataFrame, stats: Dict[str, Any],
+                                positions: np.ndarray) -> np.ndarray:
+        """
+        Classify the type of each anomalous trade
+        
+        Rules are applied in priority order, each only to the trades no
+        earlier rule matched, and classification stops as soon as every
+        trade has a type. The account and instrument aggregates behind the
+        later rules are only built if some trade is still unclassified.
+        """
+        pattern_types = np.full(len(positions), "GENERAL_ANOMALY", dtype=object)
+        pending = np.arange(len(positions))
+        
+        # Check for large trade size (against the cached frame average)
+        matched = stats['trade_size'][positions] > stats['avg_size'] * 10
+        pattern_types[pending[matched]] = "UNUSUALLY_LARGE_TRADE"
+        pending = pending[~matched]
+        if len(pending) == 0:
+            return pattern_types
+        
+        # Check for rapid succession of trades within the same account
+        self._add_account_stats(all_trades, stats)
+        matched = stats['account_min_gap_ns'][positions[pending]] < RAPID_TRADE_WINDOW_NS
+        pattern_types[pending[matched]] = "RAPID_TRADING"
+        pending = pending[~matched]
+        if len(pending) == 0:
+            return pattern_types
         
         # Check for off-hours trading
-        trade_hour = pd.to_datetime(trade['timestamp']).hour
-        if trade_hour < 9 or trade_hour > 15:
-            return "OFF_HOURS_TRADING"
+        hours = stats['hour'][positions[pending]]
+        matched = (hours < 9) | (hours > 15)
+        pattern_types[pending[matched]] = "OFF_HOURS_TRADING"
+        pending = pending[~matched]
+        if len(pending) == 0:
+            return pattern_types
         
-        # Check for unusual price movement
-        same_instrument = all_trades[all_trades['instrument'] == trade['instrument']]
-        if len(same_instrument) > 1:
-            price_change = abs(trade['price'] - same_instrument['price'].median()) / same_instrument['price'].median()
-            if price_change > 0.1:  # 10% price deviation
-                return "UNUSUAL_PRICE_MOVEMENT"
+        # Check for unusual price movement (10% deviation from instrument median)
+        self._add_instrument_stats(all_trades, stats)
+        rows = positions[pending]
+        inst_median = stats['instrument_median'][rows]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            deviation = np.abs(stats['price'][rows] - inst_median) / inst_median
+        matched = (stats['instrument_count'][rows] > 1) & (deviation > 0.1)
+        pattern_types[pending[matched]] = "UNUSUAL_PRICE_MOVEMENT"
         
-        return "GENERAL_ANOMALY"
+        return pattern_types
     
-    def _get_pattern_details(self, trade: pd.Series, all_trades: pd.DataFrame, pattern_type: str) -> Dict[str, Any]:
+    def _get_pattern_details(self, stats: Dict[str, Any], positions: np.ndarray,
+                             pattern_types: np.ndarray) -> List[Dict[str, Any]]:
         """
-        Get detailed information about the detected pattern
-        """
-        details = {
-            'trade_size': float(trade['quantity'] * trade['price']),
-            'price': float(trade['price']),
-            'quantity': int(trade['quantity'])
-        }
+        Get detailed information about each detected pattern
         
-        if pattern_type == "UNUSUALLY_LARGE_TRADE":
-            avg_size = all_trades['quantity'].mean() * all_trades['price'].mean()
-            details['size_multiple'] = float(details['trade_size'] / avg_size)
+        Account statistics are present whenever a RAPID_TRADING type was assigned.
+        """
+        trade_size = stats['trade_size'][positions]
+        size_multiple = trade_size / stats['avg_size']
         
-        elif pattern_type == "RAPID_TRADING":
-            same_account_trades = all_trades[all_trades['account_id'] == trade['account_id']]
-            details['trade_count'] = len(same_account_trades)
-            if len(same_account_trades) > 1:
-                time_diffs = pd.to_datetime(same_account_trades['timestamp']).diff().dt.total_seconds()
-                details['min_time_gap'] = float(time_diffs.min())
+        all_details = []
+        for i, pattern_type in enumerate(pattern_types.tolist()):
+            details = {
+                'trade_size': float(trade_size[i]),
+                'price': float(stats['price'][positions[i]]),
+                'quantity': int(stats['quantity'][positions[i]])
+            }
+            
+            if pattern_type == "UNUSUALLY_LARGE_TRADE":
+                details['size_multiple'] = float(size_multiple[i])
+            
+            elif pattern_type == "RAPID_TRADING":
+                details['trade_count'] = int(stats['account_trade_count'][positions[i]])
+                details['min_time_gap'] = float(stats['account_min_gap_ns'][positions[i]] / 1e9)
+            
+            all_details.append(details)
         
-        return details
+        return all_details
     
     def save_model(self, filepath: str) -> None:
         """Save the trained model"""
@@ -281,27 +981,300 @@ class AnomalyDetector:
         
         model_data = {
             'model': self.model,
-            'scaler': self.scaler,
             'feature_columns': self.feature_columns,
             'contamination': self.contamination,
-            'model_type': self.model_type
+            'model_type': self.model_type,
+            'inference': self.inference
         }
+        if self._mu is not None:
+            # Keep the scaling of a re-saved legacy model
+            model_data['feature_mean'] = self._mu
+            model_data['feature_inv_std'] = self._inv_sigma
+        
+        # Compile the treelite library next to the bundle so loading only
+        # maps it; stored relative so the two can be moved together
+        libpath = None
+        if self.inference == "treelite" and isinstance(self.model, IsolationForest):
+            libpath = os.path.splitext(filepath)[0] + ".treelite.so"
+            if self._export_treelite_lib(libpath):
+                model_data['treelite_lib'] = os.path.basename(libpath)
+            else:
+                libpath = None
         
         joblib.dump(model_data, filepath)
         logger.info(f"Model saved to {filepath}")
+        
+        if libpath is not None:
+            self._build_predictor(libpath)
     
     def load_model(self, filepath: str) -> None:
-        """Load a trained model"""
+        """
+        Load a trained model
+        
+        The bundle is read fully into memory, so the file can be replaced
+        by a later save_model without affecting a loaded detector. Each
+        loading process holds its own copy of the trees; use share_model()
+        to share one copy across workers.
+        """
         model_data = joblib.load(filepath)
         
         self.model = model_data['model']
-        self.scaler = model_data['scaler']
+        if 'scaler' in model_data:
+            # Bundles saved with a fitted StandardScaler
+            scaler = model_data['scaler']
+            self._mu = scaler.mean_.astype(np.float32)
+            self._inv_sigma = (1.0 / scaler.scale_).astype(np.float32)
+        else:
+            # Bundles saved with mean/std arrays; absent for unscaled models
+            self._mu = model_data.get('feature_mean')
+            self._inv_sigma = model_data.get('feature_inv_std')
         self.feature_columns = model_data['feature_columns']
         self.contamination = model_data['contamination']
         self.model_type = model_data['model_type']
+        self.inference = model_data.get('inference', 'sklearn')
+        self.model_fingerprint = self._fingerprint_model()
         self.is_trained = True
         
+        libpath = None
+        if 'treelite_lib' in model_data:
+            libpath = os.path.join(os.path.dirname(os.path.abspath(filepath)), model_data['treelite_lib'])
+        elif self.inference == "treelite":
+            logger.warning(f"{filepath} has no compiled treelite library; compiling, re-save to skip this")
+        self._build_predictor(libpath)
+        
         logger.info(f"Model loaded from {filepath}")
+    
+    def _fingerprint_model(self) -> str:
+        """
+        Short hash identifying the fitted model
+        
+        Hashes the fitted trees rather than the pickle, so a model gets
+        the same fingerprint after training, after a reload and in every
+        worker that loads the bundle.
+        """
+        digest = hashlib.blake2b(digest_size=8)
+        if isinstance(self.model, IsolationForest):
+            digest.update(np.float64(self.model.offset_).tobytes())
+            for estimator, features in zip(self.model.estimators_, self.model.estimators_features_):
+                tree = estimator.tree_
+                for array in (features, tree.feature, tree.threshold,
+                              tree.children_left, tree.children_right, tree.n_node_samples):
+                    digest.update(np.ascontiguousarray(array).tobytes())
+        else:
+            digest.update(joblib.hash(self.model).encode())
+        if self._mu is not None:
+            digest.update(np.asarray(self._mu).tobytes())
+            digest.update(np.asarray(self._inv_sigma).tobytes())
+        return digest.hexdigest()
+    
+    def share_model(self) -> 'SharedIsolationForest':
+        """
+        Publish the trained forest in shared memory
+        
+        The caller owns the returned segment and should keep it alive
+        while workers use it. Workers attach with attach_shared_model(),
+        typically after receiving json.dumps(shared.manifest) through the
+        SHARED_MODEL_ENV environment variable.
+        """
+        if not self.is_trained:
+            raise ValueError("Cannot share untrained model")
+        
+        return SharedIsolationForest.from_detector(self)
+    
+    def attach_shared_model(self, manifest: Dict[str, Any]) -> None:
+        """Use a forest published by share_model() instead of loading a bundle"""
+        shared = SharedIsolationForest.attach(manifest)
+        
+        self.model = None
+        self._shared_forest = shared
+        self._predictor = shared.decision_function
+        self._mu = np.array(shared.arrays['mu']) if 'mu' in shared.arrays else None
+        self._inv_sigma = np.array(shared.arrays['inv_sigma']) if 'inv_sigma' in shared.arrays else None
+        self.feature_columns = manifest['feature_columns']
+        self.contamination = manifest['contamination']
+        self.model_type = manifest['model_type']
+        self.inference = 'shared'
+        self.model_fingerprint = manifest['fingerprint']
+        self.is_trained = True
+        
+        logger.info(f"Attached shared model {manifest['segment']}")
+
+
+# Guards the temporary resource_tracker.register patch in _attach_shared_memory
+_RESOURCE_TRACKER_LOCK = threading.Lock()
+
+
+def _attach_shared_memory(name: str) -> SharedMemory:
+    """Attach to an existing segment without this process's tracker unlinking it on exit"""
+    try:
+        return SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        pass
+    
+    # Older Pythons always register; skip it so the owner stays the only tracked user
+    with _RESOURCE_TRACKER_LOCK:
+        register = resource_tracker.register
+        resource_tracker.register = lambda *args, **kwargs: None
+        try:
+            return SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+def _average_path_length(n_samples: Any) -> np.ndarray:
+    """
+    Expected path length of an unsuccessful search in a tree of n samples
+    
+    The c(n) term of IsolationForest scores, as computed by scikit-learn
+    for leaves and for the score normalization.
+    """
+    n_samples = np.asarray(n_samples, dtype=np.float64)
+    path_length = np.where(n_samples == 2, 1.0, 0.0)
+    grown = n_samples > 2
+    n = n_samples[grown]
+    path_length[grown] = 2.0 * (np.log(n - 1.0) + np.euler_gamma) - 2.0 * (n - 1.0) / n
+    return path_length
+
+
+class SharedIsolationForest:
+    """
+    Fitted IsolationForest flattened into POSIX shared memory
+    
+    scikit-learn trees keep their nodes in private buffers, so the node
+    arrays of every tree (feature, threshold, children and the per-node
+    path length) are concatenated and packed, together with the scaling
+    constants, into a single SharedMemory segment. Workers attach by
+    name and score through read-only NumPy views, so the forest is
+    neither unpickled nor copied per process.
+    """
+    
+    chunk_size = 4096  # rows scored per traversal pass
+    
+    def __init__(self, shm: SharedMemory, arrays: Dict[str, np.ndarray],
+                 manifest: Dict[str, Any], owner: bool):
+        self._shm = shm
+        self.arrays = arrays
+        self.manifest = manifest
+        self._owner = owner
+    
+    @classmethod
+    def from_detector(cls, detector: AnomalyDetector) -> 'SharedIsolationForest':
+        """Copy a trained detector's forest and scaling constants into a new segment"""
+        model = detector.model
+        if not isinstance(model, IsolationForest):
+            raise ValueError("Only scikit-learn IsolationForest models can be shared")
+        
+        feature, threshold, left, right, leaf_depth, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator, features in zip(model.estimators_, model.estimators_features_):
+            tree = estimator.tree_
+            is_leaf = tree.children_left < 0
+            
+            # Node ids are assigned parent-first, so one forward pass gives depths
+            depth = np.zeros(tree.node_count)
+            for node in np.flatnonzero(~is_leaf):
+                depth[tree.children_left[node]] = depth[node] + 1
+                depth[tree.children_right[node]] = depth[node] + 1
+            
+            # Trees index the estimator's feature subset; map back to input
+            # columns (the identity when every feature is used)
+            node_feature = np.asarray(features)[np.where(is_leaf, 0, tree.feature)]
+            
+            feature.append(node_feature)
+            threshold.append(tree.threshold)
+            left.append(np.where(is_leaf, -1, tree.children_left + offset))
+            right.append(np.where(is_leaf, -1, tree.children_right + offset))
+            # Same per-leaf term as IsolationForest._compute_score_samples
+            leaf_depth.append(depth + _average_path_length(tree.n_node_samples))
+            roots.append(offset)
+            offset += tree.node_count
+            max_depth = max(max_depth, tree.max_depth)
+        
+        arrays = {
+            'feature': np.concatenate(feature).astype(np.int64),
+            'threshold': np.concatenate(threshold).astype(np.float64),
+            'children_left': np.concatenate(left).astype(np.int64),
+            'children_right': np.concatenate(right).astype(np.int64),
+            'leaf_depth': np.concatenate(leaf_depth).astype(np.float64),
+            'roots': np.asarray(roots, dtype=np.int64)
+        }
+        if detector._mu is not None:
+            arrays['mu'] = np.asarray(detector._mu)
+            arrays['inv_sigma'] = np.asarray(detector._inv_sigma)
+        
+        layout = {}
+        size = 0
+        for key, array in arrays.items():
+            layout[key] = [size, list(array.shape), array.dtype.str]
+            size += (array.nbytes + 7) // 8 * 8
+        
+        shm = SharedMemory(create=True, size=max(size, 1))
+        views = {}
+        for key, array in arrays.items():
+            start, shape, dtype = layout[key]
+            views[key] = np.ndarray(tuple(shape), dtype=np.dtype(dtype), buffer=shm.buf, offset=start)
+            views[key][...] = array
+        
+        manifest = {
+            'segment': shm.name,
+            'layout': layout,
+            'offset': float(model.offset_),
+            'denominator': float(len(model.estimators_) *
+                                 _average_path_length([model.max_samples_])[0]),
+            'max_depth': int(max_depth),
+            'feature_columns': detector.feature_columns,
+            'contamination': detector.contamination,
+            'model_type': detector.model_type,
+            'fingerprint': detector.model_fingerprint
+        }
+        
+        logger.info(f"Shared IsolationForest in segment {shm.name} ({size} bytes)")
+        return cls(shm, views, manifest, owner=True)
+    
+    @classmethod
+    def attach(cls, manifest: Dict[str, Any]) -> 'SharedIsolationForest':
+        """Attach to a segment created by from_detector()"""
+        shm = _attach_shared_memory(manifest['segment'])
+        views = {}
+        for key, (start, shape, dtype) in manifest['layout'].items():
+            views[key] = np.ndarray(tuple(shape), dtype=np.dtype(dtype), buffer=shm.buf, offset=start)
+            views[key].flags.writeable = False
+        return cls(shm, views, manifest, owner=False)
+    
+    def decision_function(self, features_scaled: np.ndarray) -> np.ndarray:
+        """
+        Equivalent of IsolationForest.decision_function over the shared arrays
+        
+        All trees are walked together, one level per step.
+        """
+        a = self.arrays
+        X = np.asarray(features_scaled)
+        denominator = self.manifest['denominator']
+        scores = np.empty(len(X))
+        
+        for start in range(0, len(X), self.chunk_size):
+            chunk = X[start:start + self.chunk_size]
+            rows = np.arange(len(chunk))
+            nodes = np.repeat(a['roots'][:, None], len(chunk), axis=1)
+            
+            for _ in range(self.manifest['max_depth']):
+                left = a['children_left'][nodes]
+                go_left = chunk[rows, a['feature'][nodes]] <= a['threshold'][nodes]
+                nodes = np.where(left < 0, nodes, np.where(go_left, left, a['children_right'][nodes]))
+            
+            depths = a['leaf_depth'][nodes].sum(axis=0)
+            ratio = np.divide(depths, denominator, out=np.ones_like(depths), where=denominator != 0)
+            scores[start:start + len(chunk)] = -(2.0 ** -ratio) - self.manifest['offset']
+        
+        return scores
+    
+    def close(self) -> None:
+        """Release this process's mapping; the owner also unlinks the segment"""
+        self.arrays = {}
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
 
 class RealTimeAnomalyDetector:
     """
@@ -318,73 +1291,345 @@ class RealTimeAnomalyDetector:
             db_config: Database configuration
         """
         self.detector = AnomalyDetector()
-        self.detector.load_model(model_path)
+        shared_manifest = os.environ.get(SHARED_MODEL_ENV)
+        if shared_manifest:
+            self.detector.attach_shared_model(json.loads(shared_manifest))
+        else:
+            self.detector.load_model(model_path)
+        
+        # Volatility is low-frequency; training keeps full resolution.
+        # Only the numba kernel strides; the pandas fallback ignores this
+        self.detector.volatility_step = 2
         
         # Initialize connections
         self.redis_client = redis.Redis(**redis_config)
         self.db_config = db_config
         
-        # Buffer for batch processing
-        self.trade_buffer = []
+        # Trades above this value skip the buffer
+        self._critical_threshold = 10_000_000  # 1 Crore
+        
+        # Cached verdicts keyed by model and feature vector
+        self.prediction_cache_ttl = 300  # 5 minutes
+        
+        # Adaptive micro-batching for critical trades
+        self.max_batch_size = 64
+        self.max_batch_limit = 256
+        self.max_batch_wait = 0.002  # seconds
+        self.batch_latency_target = 0.005  # seconds, p99
+        self._batch_latencies = deque(maxlen=100)
+        self._critical_queue = deque()
+        self._critical_ready = threading.Condition()
+        self._active_producers = 0  # process_trade calls in flight
+        self._closed = False
+        self._batch_worker = threading.Thread(
+            target=self._run_batch_worker,
+            name="anomaly-batch-worker",
+            daemon=True
+        )
+        self._batch_worker.start()
+        
+        # Columnar buffer for batch processing; trades from failed flushes
+        # are retained up to max_buffer_retained, then the oldest dropped
         self.buffer_size = 100
+        self.max_buffer_retained = 10 * self.buffer_size
+        self._buf_trade_id = np.empty(self.buffer_size, dtype=object)
+        self._buf_ts = np.empty(self.buffer_size, dtype=np.int64)  # Timestamp.value
+        self._buf_tz = np.empty(self.buffer_size, dtype=object)
+        self._buf_acct = np.empty(self.buffer_size, dtype=object)
+        self._buf_inst = np.empty(self.buffer_size, dtype=object)
+        self._buf_q = np.empty(self.buffer_size, dtype=np.float64)
+        self._buf_p = np.empty(self.buffer_size, dtype=np.float64)
+        self._buf_idx = 0
+        self._buffer_lock = threading.Lock()
         
     def process_trade(self, trade_data: Dict) -> Optional[Dict]:
         """
         Process a single trade for anomaly detection
         
+        Safe to call from several threads; critical trades submitted
+        concurrently are scored together in one micro-batch.
+        
         Args:
             trade_data: Trade data dictionary
             
         Returns:
             Anomaly alert if detected, None otherwise
         """
-        # Add to buffer
-        self.trade_buffer.append(trade_data)
+        with self._critical_ready:
+            self._active_producers += 1
+        try:
+            with self._buffer_lock:
+                # Add to buffer; a failed flush leaves it full, so grow and retry later
+                if self._buf_idx == len(self._buf_q):
+                    if len(self._buf_q) < self.max_buffer_retained:
+                        self._grow_buffer()
+                    else:
+                        self._drop_oldest_trades(self.buffer_size)
+                i = self._buf_idx
+                # Same fallback id detect_patterns gives a frame without trade_id
+                self._buf_trade_id[i] = trade_data.get('trade_id', f'trade_{i}')
+                ts = pd.Timestamp(trade_data['timestamp'])
+                self._buf_ts[i] = ts.value
+                self._buf_tz[i] = ts.tz
+                self._buf_acct[i] = trade_data['account_id']
+                self._buf_inst[i] = trade_data['instrument']
+                self._buf_q[i] = trade_data['quantity']
+                self._buf_p[i] = trade_data['price']
+                self._buf_idx = i + 1
+                
+                # Process when buffer is full; after a failed flush, retry
+                # once per buffer_size new trades rather than on every trade
+                if self._buf_idx >= self.buffer_size and self._buf_idx % self.buffer_size == 0:
+                    return self._process_buffer()
+            
+            # For critical trades, process immediately
+            if self._is_critical_trade(trade_data):
+                return self._submit_critical_trade(trade_data).result()
+            
+            return None
+        finally:
+            with self._critical_ready:
+                self._active_producers -= 1
+                self._critical_ready.notify()
+    
+    _BUFFER_COLUMNS = ('_buf_trade_id', '_buf_ts', '_buf_tz', '_buf_acct', '_buf_inst',
+                       '_buf_q', '_buf_p')
+    
+    def _grow_buffer(self) -> None:
+        """Double the buffer capacity, up to max_buffer_retained, keeping the buffered trades"""
+        capacity = min(2 * len(self._buf_q), self.max_buffer_retained)
+        for name in self._BUFFER_COLUMNS:
+            column = getattr(self, name)
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
+    
+    def _drop_oldest_trades(self, count: int) -> None:
+        """Discard the oldest buffered trades, which could not be flushed"""
+        n = self._buf_idx
+        for name in self._BUFFER_COLUMNS:
+            column = getattr(self, name)
+            column[:n - count] = column[count:n]
+        self._buf_idx = n - count
+        logger.error(f"Dropped {count} unflushed trades; buffer is at max_buffer_retained")
+    
+    def _is_critical_trade(self, trade_data: Dict) -> bool:
+        """Check if trade requires immediate processing"""
+        # quantity and price are required fields, already read when buffering
+        return trade_data['quantity'] * trade_data['price'] > self._critical_threshold
+    
+    def _submit_critical_trade(self, trade_data: Dict) -> Future:
+        """Queue a critical trade for the next micro-batch"""
+        future = Future()
+        with self._critical_ready:
+            if self._closed:
+                raise RuntimeError("Real-time detector is closed")
+            self._critical_queue.append((trade_data, future))
+            self._critical_ready.notify()
+        return future
+    
+    def _drain_critical_queue(self) -> List[Tuple[Dict, Future]]:
+        """
+        Wait for critical trades and take up to max_batch_size of them
         
-        # Process when buffer is full
-        if len(self.trade_buffer) >= self.buffer_size:
-            return self._process_buffer()
+        Returns as soon as the batch is full, max_batch_wait has passed
+        since the first trade was seen, or no process_trade call is left
+        that could still queue a trade. A lone producer is never delayed.
+        """
+        with self._critical_ready:
+            while not self._critical_queue:
+                if self._closed:
+                    return []
+                self._critical_ready.wait()
+            
+            # Queued trades belong to producers blocked on their result
+            deadline = time.monotonic() + self.max_batch_wait
+            while (len(self._critical_queue) < self.max_batch_size and
+                   self._active_producers > len(self._critical_queue)):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._critical_ready.wait(remaining)
+            
+            batch_len = min(len(self._critical_queue), self.max_batch_size)
+            return [self._critical_queue.popleft() for _ in range(batch_len)]
+    
+    def _run_batch_worker(self) -> None:
+        """Score queued critical trades in micro-batches"""
+        while True:
+            batch = self._drain_critical_queue()
+            if not batch:
+                return
+            started = time.perf_counter()
+            
+            try:
+                alerts = self._process_critical_batch([trade for trade, _ in batch])
+            except Exception as e:
+                logger.error(f"Critical trade batch failed: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            
+            for (_, future), alert in zip(batch, alerts):
+                future.set_result(alert)
+            
+            self._tune_batch_size(len(batch), time.perf_counter() - started)
+    
+    def close(self) -> None:
+        """Stop the batch worker after it scores the queued critical trades"""
+        with self._critical_ready:
+            self._closed = True
+            self._critical_ready.notify_all()
+        self._batch_worker.join()
+    
+    def _tune_batch_size(self, batch_len: int, latency: float) -> None:
+        """
+        Adapt max_batch_size to the observed p99 batch latency
         
-        # For critical trades, process immediately
-        if self._is_critical_trade(trade_data):
-            return self._process_single_trade(trade_data)
+        Halves the batch size when p99 exceeds the target and doubles it
+        (up to max_batch_limit) when full batches finish well under it.
+        """
+        self._batch_latencies.append(latency)
+        if len(self._batch_latencies) < self._batch_latencies.maxlen:
+            return
         
-        return None
+        p99 = float(np.percentile(self._batch_latencies, 99))
+        if p99 > self.batch_latency_target and self.max_batch_size > 1:
+            self.max_batch_size = max(1, self.max_batch_size // 2)
+            self._batch_latencies.clear()
+        elif (batch_len >= self.max_batch_size and
+              p99 < self.batch_latency_target / 2 and
+              self.max_batch_size < self.max_batch_limit):
+            self.max_batch_size = min(self.max_batch_limit, self.max_batch_size * 2)
+            self._batch_latencies.clear()
     
-    def _is_critical_trade(self, trade_data: Dict) -> bool:
-        """Check if trade requires immediate processing"""
-        trade_value = trade_data.get('quantity', 0) * trade_data.get('price', 0)
-        return trade_value > 10000000  # 1 Crore threshold
-    
-    def _process_single_trade(self, trade_data: Dict) -> Optional[Dict]:
-        """Process a single trade immediately"""
-        df = pd.DataFrame([trade_data])
-        predictions, scores = self.detector.predict(df)
-        
-        if predictions[0] == 1:  # Anomaly detected
-            return {
-                'alert_type': 'REAL_TIME_ANOMALY',
-                'trade_id': trade_data.get('trade_id'),
-                'anomaly_score': float(scores[0]),
-                'timestamp': datetime.utcnow().isoformat(),
-                'details': trade_data
-            }
+    def _process_critical_batch(self, trades: List[Dict]) -> List[Optional[Dict]]:
+        """
+        Process a micro-batch of critical trades in one predict call
         
-        return None
+        Each trade's features come from a frame of its own, as if it had
+        been submitted alone, so a verdict never depends on its batch-mates;
+        only the scoring is batched.
+        """
+        features = np.vstack([self.detector.transform(pd.DataFrame([trade_data]))
+                              for trade_data in trades])
+        predictions, scores = self._predict_cached(features)
+        
+        alerts = []
+        for trade_data, prediction, score in zip(trades, predictions, scores):
+            if prediction == 1:  # Anomaly detected
+                alerts.append({
+                    'alert_type': 'REAL_TIME_ANOMALY',
+                    'trade_id': trade_data.get('trade_id'),
+                    'anomaly_score': float(score),
+                    'timestamp': datetime.utcnow().isoformat(),
+                    'details': trade_data
+                })
+            else:
+                alerts.append(None)
+        
+        return alerts
+    
+    def _prediction_cache_key(self, features_row: np.ndarray) -> str:
+        """
+        Build the Redis key for a feature vector
+        
+        Keys are scoped by the model fingerprint so a retrained or
+        reloaded model, or another model on the same Redis, never reads
+        verdicts cached for a different forest.
+        """
+        digest = hashlib.blake2b(features_row.tobytes(), digest_size=16).hexdigest()
+        return f"if:{self.detector.model_fingerprint}:{digest}"
+    
+    def _predict_cached(self, features_scaled: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Predict with a Redis cache in front of the model
+        
+        Looks up every row with a single MGET and only scores cache misses.
+        The cache is best-effort: if Redis is unavailable every row is
+        scored by the model and nothing is written back.
+        """
+        keys = [self._prediction_cache_key(row) for row in features_scaled]
+        try:
+            cached = self.redis_client.mget(keys)
+        except redis.RedisError as e:
+            logger.warning(f"Prediction cache lookup failed, scoring every row: {e}")
+            cached = [None] * len(keys)
+        
+        predictions = np.zeros(len(keys), dtype=int)
+        scores = np.zeros(len(keys), dtype=np.float64)
+        misses = []
+        for i, value in enumerate(cached):
+            if value is None:
+                misses.append(i)
+                continue
+            verdict = _loads(value)
+            predictions[i] = verdict['pred']
+            scores[i] = verdict['score']
+        
+        if misses:
+            miss_predictions, miss_scores = self.detector.predict_scaled(features_scaled[misses])
+            predictions[misses] = miss_predictions
+            scores[misses] = miss_scores
+            
+            pipe = self.redis_client.pipeline(transaction=False)
+            for i, pred, score in zip(misses, miss_predictions, miss_scores):
+                pipe.setex(
+                    keys[i],
+                    self.prediction_cache_ttl,
+                    _dumps({'pred': int(pred), 'score': float(score)})
+                )
+            try:
+                pipe.execute()
+            except redis.RedisError as e:
+                logger.warning(f"Prediction cache write failed: {e}")
+        
+        return predictions, scores
+    
+    def _buffered_timestamps(self, n: int) -> Any:
+        """
+        Rebuild the first n buffered timestamps with their time zones
+        
+        Aware timestamps are buffered as UTC nanoseconds plus their zone,
+        so the wall-clock hour survives for the time-based features. A
+        buffer mixing zones comes back as Timestamp objects, as a frame
+        built from the trade dicts would hold them.
+        """
+        values = self._buf_ts[:n]
+        zones = self._buf_tz[:n]
+        valid = values != pd.NaT.value
+        zone_set = set(zones[valid])
+        
+        if len(zone_set) > 1:
+            return np.array([pd.Timestamp(v, tz='UTC').tz_convert(z) if z is not None else pd.Timestamp(v)
+                             for v, z in zip(values, zones)], dtype=object)
+        
+        timestamps = pd.DatetimeIndex(values.view('datetime64[ns]'))
+        zone = next(iter(zone_set), None)
+        if zone is not None:
+            timestamps = timestamps.tz_localize('UTC').tz_convert(zone)
+        return timestamps
     
     def _process_buffer(self) -> List[Dict]:
         """Process the entire buffer"""
-        if not self.trade_buffer:
+        n = self._buf_idx
+        if n == 0:
             return []
         
-        df = pd.DataFrame(self.trade_buffer)
-        patterns = self.detector.detect_patterns(df)
-        
-        # Clear buffer
-        self.trade_buffer = []
+        df = pd.DataFrame({
+            'trade_id': self._buf_trade_id[:n],
+            'timestamp': self._buffered_timestamps(n),
+            'account_id': pd.Categorical(self._buf_acct[:n]),
+            'instrument': pd.Categorical(self._buf_inst[:n]),
+            'quantity': self._buf_q[:n],
+            'price': self._buf_p[:n]
+        })
+        predictions, scores = self._predict_cached(self.detector.transform(df))
+        patterns = self.detector.detect_patterns(df, predictions, scores)
         
         # Convert to alerts
         alerts = []
+        pipe = self.redis_client.pipeline(transaction=False)
         for pattern in patterns:
             alert = {
                 'alert_type': 'BATCH_ANOMALY',
@@ -397,12 +1642,19 @@ class RealTimeAnomalyDetector:
             alerts.append(alert)
             
             # Store in Redis for real-time access
-            self.redis_client.setex(
+            pipe.setex(
                 f"anomaly_alert:{pattern['trade_id']}", 
                 3600,  # 1 hour expiry
-                json.dumps(alert)
+                _dumps(alert)
             )
         
+        # One round trip for all alert writes; if it fails the trades stay
+        # buffered and the flush is retried
+        pipe.execute()
+        
+        # Clear buffer
+        self._buf_idx = 0
+        
         return alerts
 
 # Example usage and testing
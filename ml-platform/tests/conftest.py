@@ -0,0 +1,100 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+import redis
+
+# anomaly_detector is a standalone module, not an installed package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'models'))
+
+import anomaly_detector as ad  # noqa: E402
+
+
+def _make_trades(n=2000, seed=0):
+    rng = np.random.RandomState(seed)
+    trades = pd.DataFrame({
+        'trade_id': [f'T{i}' for i in range(n)],
+        'timestamp': pd.Timestamp('2023-01-02 09:15') + pd.to_timedelta(
+            np.sort(rng.randint(0, 6 * 3600, n)), unit='s'),
+        'account_id': rng.choice([f'A{i}' for i in range(50)], n),
+        'instrument': rng.choice(['RELIANCE', 'TCS', 'INFY', 'HDFCBANK'], n),
+        'quantity': rng.randint(1, 100, n).astype(float),
+        'price': rng.uniform(100, 3000, n),
+    })
+    outliers = rng.choice(n, n // 20, replace=False)
+    trades.loc[outliers, 'quantity'] *= 10
+    return trades
+
+
+@pytest.fixture
+def make_trades():
+    """Factory for synthetic trades: make_trades(n=2000, seed=0)"""
+    return _make_trades
+
+
+@pytest.fixture
+def messy_trades():
+    """Shuffled rows, a non-monotonic index, missing keys and tz-aware timestamps"""
+    trades = _make_trades(seed=1).sample(frac=1, random_state=2)
+    trades.index = np.random.RandomState(3).permutation(len(trades)) * 3
+    trades['timestamp'] = trades['timestamp'].dt.tz_localize('Asia/Kolkata')
+    trades.iloc[:30, trades.columns.get_loc('instrument')] = np.nan
+    trades.iloc[30:50, trades.columns.get_loc('account_id')] = np.nan
+    trades.iloc[50:60, trades.columns.get_loc('timestamp')] = pd.NaT
+    return trades
+
+
+@pytest.fixture(scope='session')
+def trained():
+    detector = ad.AnomalyDetector(contamination=0.05)
+    detector.train(_make_trades(), n_jobs=1)
+    return detector
+
+
+@pytest.fixture
+def pandas_features(monkeypatch):
+    """Extract features with the pandas fallback instead of numba"""
+    monkeypatch.setattr(ad, 'NUMBA_AVAILABLE', False)
+
+
+class FakeRedis:
+    """Just enough of redis.Redis for RealTimeAnomalyDetector"""
+
+    def __init__(self):
+        self.store = {}
+        self.down = False
+
+    def mget(self, keys):
+        if self.down:
+            raise redis.ConnectionError("Redis is down")
+        return [self.store.get(key) for key in keys]
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.writes = []
+
+    def setex(self, key, ttl, value):
+        self.writes.append((key, value))
+
+    def execute(self):
+        if self.client.down:
+            raise redis.ConnectionError("Redis is down")
+        self.client.store.update(self.writes)
+
+
+@pytest.fixture
+def real_time(trained, tmp_path):
+    path = tmp_path / 'model.pkl'
+    trained.save_model(str(path))
+
+    detector = ad.RealTimeAnomalyDetector(str(path), {}, {})
+    detector.redis_client = FakeRedis()
+    yield detector
+    detector.close()
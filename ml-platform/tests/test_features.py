@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import anomaly_detector as ad
+
+
+@pytest.mark.skipif(not ad.NUMBA_AVAILABLE, reason="numba not installed")
+def test_numba_features_match_pandas(messy_trades, monkeypatch):
+    numba_features = ad.AnomalyDetector().extract_features(messy_trades)
+
+    monkeypatch.setattr(ad, 'NUMBA_AVAILABLE', False)
+    pandas_features = ad.AnomalyDetector().extract_features(messy_trades)
+
+    pd.testing.assert_frame_equal(numba_features, pandas_features)
+
+
+def test_features_use_wall_clock_hour(messy_trades):
+    features = ad.AnomalyDetector().extract_features(messy_trades)
+
+    valid = messy_trades['timestamp'].notna()
+    np.testing.assert_array_equal(features.loc[valid, 'trading_hour'],
+                                  messy_trades.loc[valid, 'timestamp'].dt.hour)
+
+
+@pytest.mark.parametrize('use_numba', [True, False])
+def test_features_on_non_unique_index(make_trades, monkeypatch, use_numba):
+    if use_numba and not ad.NUMBA_AVAILABLE:
+        pytest.skip("numba not installed")
+    monkeypatch.setattr(ad, 'NUMBA_AVAILABLE', use_numba)
+    trades = pd.concat([make_trades(n=300, seed=1), make_trades(n=300, seed=2)])
+
+    features = ad.AnomalyDetector().extract_features(trades)
+    expected = ad.AnomalyDetector().extract_features(trades.reset_index(drop=True))
+
+    assert features.shape == (600, len(ad.FEATURE_COLUMNS))
+    assert features.index.equals(trades.index)
+    np.testing.assert_array_equal(features.to_numpy(), expected.to_numpy())
+
+
+def test_sharded_features_match_in_process(messy_trades, pandas_features, monkeypatch):
+    trades = pd.concat([messy_trades, messy_trades.iloc[:200]])  # non-unique index
+    expected = ad.AnomalyDetector().extract_features(trades)
+
+    monkeypatch.setattr(ad, 'PARALLEL_FEATURE_MIN_ROWS', 0)
+    sharded = ad.AnomalyDetector().extract_features(trades, n_jobs=2)
+
+    pd.testing.assert_frame_equal(sharded, expected)
+
+
+def test_instrument_shards_cover_every_row(messy_trades):
+    instrument = messy_trades['instrument']
+
+    for n_shards in (1, 3, 8):
+        shards = ad._instrument_shards(instrument, n_shards)
+        assert len(shards) <= n_shards
+        np.testing.assert_array_equal(np.sort(np.concatenate(shards)), np.arange(len(instrument)))
+        for positions in shards:
+            assert np.all(np.diff(positions) > 0)
@@ -0,0 +1,121 @@
+import os
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import IsolationForest
+from sklearn.preprocessing import StandardScaler
+
+import anomaly_detector as ad
+
+
+def test_save_and_load_round_trip(trained, make_trades, tmp_path):
+    trades = make_trades(seed=5)
+    path = tmp_path / 'model.pkl'
+    trained.save_model(str(path))
+
+    detector = ad.AnomalyDetector()
+    detector.load_model(str(path))
+
+    np.testing.assert_array_equal(detector.predict(trades)[1], trained.predict(trades)[1])
+    assert detector.model_fingerprint == trained.model_fingerprint
+
+
+def test_loaded_model_survives_resave_over_its_file(trained, make_trades, tmp_path):
+    trades = make_trades(seed=5)
+    path = tmp_path / 'model.pkl'
+    trained.save_model(str(path))
+
+    detector = ad.AnomalyDetector()
+    detector.load_model(str(path))
+    expected = detector.predict(trades)[1]
+
+    other = ad.AnomalyDetector(contamination=0.05, random_state=7)
+    other.train(make_trades(seed=6), n_jobs=1)
+    other.save_model(str(path))
+
+    np.testing.assert_array_equal(detector.predict(trades)[1], expected)
+    assert detector.model_fingerprint == trained.model_fingerprint
+
+
+def test_treelite_save_and_load_parity(make_trades, tmp_path):
+    pytest.importorskip('treelite')
+    pytest.importorskip('tl2cgen')
+    trades = make_trades(seed=5)
+
+    detector = ad.AnomalyDetector(contamination=0.05, inference="treelite")
+    detector.model.set_params(n_estimators=20)  # keeps the compile short
+    detector.train(make_trades(), n_jobs=1)
+    path = tmp_path / 'model.pkl'
+    detector.save_model(str(path))
+    if not os.path.exists(tmp_path / 'model.treelite.so'):
+        pytest.skip("no compiler toolchain for tl2cgen")
+
+    loaded = ad.AnomalyDetector()
+    loaded.load_model(str(path))
+    assert loaded._predictor is not None
+
+    features = detector.transform(trades)
+    predictions, scores = loaded.predict(trades)
+    np.testing.assert_allclose(scores, detector.model.decision_function(features), rtol=0, atol=1e-6)
+    np.testing.assert_array_equal(predictions, detector.model.predict(features) == -1)
+
+
+def test_shared_forest_matches_sklearn(trained, make_trades):
+    trades = make_trades(seed=4)
+    features = trained.transform(trades)
+
+    shared = trained.share_model()
+    try:
+        worker = ad.AnomalyDetector()
+        worker.attach_shared_model(shared.manifest)
+        predictions, scores = worker.predict(trades)
+
+        np.testing.assert_allclose(scores, trained.model.decision_function(features), rtol=0, atol=1e-12)
+        np.testing.assert_array_equal(predictions, trained.model.predict(features) == -1)
+        assert worker.model_fingerprint == trained.model_fingerprint
+    finally:
+        shared.close()
+
+
+def test_shared_forest_with_feature_subsampling(make_trades):
+    trades = make_trades(seed=4)
+    detector = ad.AnomalyDetector(contamination=0.05)
+    detector.model.set_params(n_estimators=50, max_features=0.5)
+    detector.train(make_trades(), n_jobs=1)
+    features = detector.transform(trades)
+
+    shared = detector.share_model()
+    try:
+        worker = ad.AnomalyDetector()
+        worker.attach_shared_model(shared.manifest)
+        scores = worker.predict(trades)[1]
+
+        np.testing.assert_allclose(scores, detector.model.decision_function(features), rtol=0, atol=1e-12)
+    finally:
+        shared.close()
+
+
+def test_load_legacy_standard_scaler_bundle(make_trades, tmp_path):
+    trades = make_trades()
+    features = ad.AnomalyDetector().extract_features(trades)
+    scaler = StandardScaler().fit(features)
+    model = IsolationForest(contamination=0.05, random_state=42, n_estimators=50).fit(
+        scaler.transform(features))
+
+    path = tmp_path / 'legacy.pkl'
+    joblib.dump({
+        'model': model,
+        'scaler': scaler,
+        'feature_columns': features.columns.tolist(),
+        'contamination': 0.05,
+        'model_type': 'isolation_forest'
+    }, path)
+
+    detector = ad.AnomalyDetector()
+    detector.load_model(str(path))
+    predictions, scores = detector.predict(trades)
+
+    expected = scaler.transform(features).astype(np.float32)
+    np.testing.assert_allclose(scores, model.decision_function(expected), rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(predictions, model.predict(expected) == -1)
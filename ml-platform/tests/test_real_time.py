@@ -0,0 +1,182 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+import redis
+
+import anomaly_detector as ad
+
+
+def _feed(real_time, trades):
+    """Process trades, ignoring flushes that fail while Redis is down"""
+    for trade in trades:
+        try:
+            real_time.process_trade(trade)
+        except redis.ConnectionError:
+            pass
+
+
+def test_failed_flush_keeps_trades_and_retries(real_time, make_trades):
+    size = real_time.buffer_size
+    trades = make_trades(n=2 * size, seed=6).to_dict('records')
+
+    real_time.redis_client.down = True
+    _feed(real_time, trades[:size])
+    assert real_time._buf_idx == size
+
+    # Later trades are buffered instead of failing on a full buffer, and the
+    # flush is retried once another buffer_size trades have arrived
+    real_time.redis_client.down = False
+    for trade in trades[size:-1]:
+        assert real_time.process_trade(trade) is None
+    alerts = real_time.process_trade(trades[-1])
+
+    assert isinstance(alerts, list)
+    assert real_time._buf_idx == 0
+
+    expected = real_time.detector.detect_patterns(pd.DataFrame(trades))
+    assert [alert['details']['trade_id'] for alert in alerts] == [p['trade_id'] for p in expected]
+
+
+def test_buffer_is_capped_while_flushes_fail(real_time, make_trades):
+    real_time.max_buffer_retained = 3 * real_time.buffer_size
+    trades = make_trades(n=5 * real_time.buffer_size, seed=8).to_dict('records')
+
+    real_time.redis_client.down = True
+    _feed(real_time, trades)
+
+    assert len(real_time._buf_q) == real_time.max_buffer_retained
+    assert real_time._buf_idx == real_time.max_buffer_retained
+    # The oldest trades were dropped, the newest kept
+    kept = [trade['trade_id'] for trade in trades[-real_time.max_buffer_retained:]]
+    assert real_time._buf_trade_id.tolist() == kept
+
+
+def test_buffer_keeps_time_zone_and_fallback_ids(real_time, make_trades):
+    trades = make_trades(n=real_time.buffer_size, seed=7).drop(columns='trade_id')
+    trades['timestamp'] = trades['timestamp'].dt.tz_localize('Asia/Kolkata')
+
+    for trade in trades.to_dict('records'):
+        alerts = real_time.process_trade(trade)
+
+    expected = real_time.detector.detect_patterns(trades)
+    assert [alert['details'] for alert in alerts] == expected
+
+    keys = [key for key in real_time.redis_client.store if key.startswith('anomaly_alert:')]
+    assert len(keys) == len(alerts)
+    assert 'anomaly_alert:None' not in keys
+
+
+def test_prediction_cache_keys_are_scoped_by_model(real_time):
+    row = np.zeros(len(ad.FEATURE_COLUMNS), dtype=np.float32)
+    key = real_time._prediction_cache_key(row)
+
+    real_time.detector.model_fingerprint = 'other-model'
+    assert real_time._prediction_cache_key(row) != key
+
+
+def test_critical_trade_scored_while_redis_is_down(real_time, make_trades):
+    trade = make_trades(n=1, seed=9).to_dict('records')[0]
+    trade.update(quantity=10_000.0, price=2_000.0)
+    assert real_time._is_critical_trade(trade)
+
+    real_time.redis_client.down = True
+    offline = real_time.process_trade(trade)
+
+    real_time.redis_client.down = False
+    online = real_time.process_trade(trade)
+
+    assert offline is not None and online is not None
+    assert offline['anomaly_score'] == online['anomaly_score']
+
+
+def _critical_trades(make_trades, n, seed):
+    trades = make_trades(n=n, seed=seed)
+    trades['quantity'] *= 10_000
+    return trades.to_dict('records')
+
+
+def test_critical_batch_matches_trades_scored_alone(real_time, make_trades):
+    trades = _critical_trades(make_trades, 64, seed=10)
+
+    batched = real_time._process_critical_batch(trades)
+    alone = []
+    for trade in trades:
+        real_time.redis_client.store.clear()
+        alone.extend(real_time._process_critical_batch([trade]))
+
+    assert [alert and alert['anomaly_score'] for alert in batched] == \
+        [alert and alert['anomaly_score'] for alert in alone]
+
+
+_PRODUCERS_SCRIPT = """
+import sys, threading
+sys.path.insert(0, sys.argv[1])
+from conftest import FakeRedis, _make_trades
+import anomaly_detector as ad
+
+real_time = ad.RealTimeAnomalyDetector(sys.argv[2], {}, {})
+real_time.redis_client = FakeRedis()
+trades = _make_trades(n=400, seed=11)
+trades['quantity'] *= 10_000
+trades = trades.to_dict('records')
+
+def produce(k):
+    for trade in trades[k::4]:
+        real_time.process_trade(trade)
+
+threads = [threading.Thread(target=produce, args=(k,)) for k in range(4)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+real_time.close()
+"""
+
+
+@pytest.mark.skipif(not ad.NUMBA_AVAILABLE, reason="numba not installed")
+def test_concurrent_producers_with_workqueue_layer(trained, tmp_path):
+    # The buffer flush and the critical batch worker both extract features;
+    # numba's workqueue layer aborts the process if they overlap
+    path = tmp_path / 'model.pkl'
+    trained.save_model(str(path))
+
+    result = subprocess.run(
+        [sys.executable, '-c', _PRODUCERS_SCRIPT, os.path.dirname(os.path.abspath(__file__)), str(path)],
+        env=dict(os.environ, NUMBA_THREADING_LAYER='workqueue'),
+        capture_output=True, text=True, timeout=300)
+
+    assert result.returncode == 0, result.stderr
+
+
+def test_payload_encoding_is_the_same_for_both_backends(monkeypatch):
+    pytest.importorskip('orjson')
+    alert = {
+        'alert_type': 'BATCH_ANOMALY',
+        'anomaly_score': np.float64(-0.125),
+        'confidence': np.float32(0.75),
+        'details': {
+            'trade_id': 'T1',
+            'quantity': np.int64(500),
+            'price': float('nan'),
+            'is_anomaly': np.bool_(True),
+            'timestamp': pd.Timestamp('2023-01-02 09:15', tz='Asia/Kolkata'),
+            'settled_at': pd.NaT,
+            'instrument': 'NIFTY ₹',
+            'window': (1, 2.5),
+        },
+    }
+    outlier = {'score': 1e-7, 'notional': 1e16}
+
+    monkeypatch.setattr(ad, 'ORJSON_AVAILABLE', True)
+    fast = ad._dumps(alert), ad._dumps(outlier)
+    monkeypatch.setattr(ad, 'ORJSON_AVAILABLE', False)
+    slow = ad._dumps(alert), ad._dumps(outlier)
+
+    assert fast[0] == slow[0]
+    assert ad._loads(fast[0])['details']['price'] is None
+    # Only float exponents are spelled differently; the values agree
+    assert ad._loads(fast[1]) == ad._loads(slow[1]) == outlier